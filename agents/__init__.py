@@ -1,3 +1,8 @@
-from .selector_chat_manager import team
+__all__ = ["build_team"]
 
-__all__ = ["team"]
\ No newline at end of file
+def __getattr__(name):
+    # Import the agent team lazily so loading agents.browser_pool stays cheap
+    if name == "build_team":
+        from .selector_chat_manager import build_team
+        return build_team
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
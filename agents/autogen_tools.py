@@ -1,29 +1,29 @@
-from typing import Annotated, Dict, Optional, Any
-from playwright_helper.playwright_manager import PlaywrightManager
+from typing import Annotated, Awaitable, Dict, List, Literal, Any
+from .browser_pool import get_manager
+import asyncio
 import os
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Playwright manager
-playwright_manager = PlaywrightManager(headless=False)
-
 async def initialize_browser(
-    headless: Annotated[bool, "Whether to run browser in headless mode"] = False
+    headless: Annotated[bool, "Whether to run browser in headless mode"] = False,
+    use_persistent: Annotated[bool, "Whether to reuse the persistent browser profile"] = True
 ) -> Annotated[Dict[str, str], "Initialization status"]:
     """Initialize the browser instance.
     
     Args:
         headless (bool): Whether to run the browser in headless mode
+        use_persistent (bool): Whether to reuse the persistent browser profile
         
     Returns:
         Dict[str, str]: Dictionary containing status and message
     """
+    if get_manager().is_initialized:
+        return {"status": "success", "message": "Browser already initialized"}
     try:
-        await playwright_manager.initialize()
-        logger.info("Browser initialized successfully")
+        await get_manager().initialize(use_persistent=use_persistent)
+        logger.debug("Browser initialized successfully")
         return {"status": "success", "message": "Browser initialized successfully"}
     except Exception as e:
         logger.error(f"Failed to initialize browser: {str(e)}")
@@ -31,25 +31,65 @@ async def initialize_browser(
 
 async def navigate_to_url(
     url: Annotated[str, "The URL to navigate to"],
-    timeout: Annotated[int, "Timeout in milliseconds"] = 5000
+    timeout: Annotated[int, "Timeout in milliseconds"] = 5000,
+    wait_until: Annotated[
+        Literal["domcontentloaded", "load", "networkidle"],
+        "Load state to wait for; use networkidle for single-page apps that render after loading"
+    ] = "domcontentloaded"
 ) -> Annotated[Dict[str, str], "Navigation status"]:
     """Navigate to the specified URL.
     
     Args:
         url (str): The URL to navigate to
         timeout (int): Timeout in milliseconds
+        wait_until (str): Load state to wait for: "domcontentloaded", "load" or "networkidle"
         
     Returns:
         Dict[str, str]: Dictionary containing status and message/url
     """
     try:
-        result = await playwright_manager.goto_url(url, timeout)
-        logger.info(f"Navigation to {url} completed with status: {result['status']}")
-        return result
+        result = await get_manager().goto_url(url, timeout, wait_until=wait_until)
+        logger.debug("Navigation to %s completed with status: %s", url, result['status'])
+        return result.to_dict()
     except Exception as e:
         logger.error(f"Failed to navigate to {url}: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+async def navigate_and_snapshot(
+    url: Annotated[str, "The URL to navigate to"],
+    timeout: Annotated[int, "Timeout in milliseconds"] = 5000,
+    wait_until: Annotated[
+        Literal["domcontentloaded", "load", "networkidle"],
+        "Load state to wait for; use networkidle for single-page apps that render after loading"
+    ] = "domcontentloaded"
+) -> Annotated[Dict[str, Any], "Navigation status and current page DOM"]:
+    """Navigate to the specified URL and return the resulting page DOM in one call.
+    
+    Args:
+        url (str): The URL to navigate to
+        timeout (int): Timeout in milliseconds
+        wait_until (str): Load state to wait for: "domcontentloaded", "load" or "networkidle"
+        
+    Returns:
+        Dict[str, Any]: Dictionary containing status, url and DOM data
+    """
+    try:
+        result = await get_manager().goto_url(url, timeout, wait_until=wait_until)
+        if result["status"] != "success":
+            logger.error(f"Failed to navigate to {url}: {result['message']}")
+            return result.to_dict()
+        dom_result = await get_page_dom()
+        logger.debug("Navigation to %s and DOM retrieval completed with status: %s", url, dom_result['status'])
+        return {
+            "status": dom_result["status"],
+            "message": dom_result["message"],
+            "url": url,
+            "current_page_dom": dom_result.get("current_page_dom")
+        }
+    except Exception as e:
+        logger.error(f"Failed to navigate and snapshot {url}: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
 async def get_current_url() -> Annotated[Dict[str, str], "Current URL status"]:
     """Get the current URL of the page.
     
@@ -57,8 +97,8 @@ async def get_current_url() -> Annotated[Dict[str, str], "Current URL status"]:
         Dict[str, str]: Dictionary containing status and current URL
     """
     try:
-        current_url = playwright_manager.page.url
-        logger.info(f"Retrieved current URL: {current_url}")
+        current_url = get_manager().page.url
+        logger.debug("Retrieved current URL: %s", current_url)
         return {"status": "success", "current_url": current_url}
     except Exception as e:
         logger.error(f"Failed to get current URL: {str(e)}")
@@ -67,55 +107,130 @@ async def get_current_url() -> Annotated[Dict[str, str], "Current URL status"]:
 async def get_page_dom() -> Annotated[Dict[str, Any], "Current page DOM representation"]:
     """Get the current page's DOM representation with mmid attributes.
     
+    The manager serves the DOM from cache when the page has neither navigated, changed
+    nor been interacted with since the last retrieval.
+    
     Returns:
         Dict[str, Any]: Dictionary containing status and DOM data
     """
     try:
-        result = await playwright_manager.get_clean_dom_representation()
-        logger.info("Successfully retrieved page DOM")
-        return result
+        result = await get_manager().get_clean_dom_representation()
+        logger.debug("Successfully retrieved page DOM")
+        return result.to_dict()
     except Exception as e:
         logger.error(f"Failed to get page DOM: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+# Side-effect-free tools that batch_read may run concurrently
+READ_ONLY_TOOLS = {
+    "get_current_url": get_current_url,
+    "get_page_dom": get_page_dom,
+}
+
+async def batch_read(
+    calls: Annotated[List[Dict[str, Any]], "Read-only calls, each as {\"name\": tool name, \"args\": {...}}"]
+) -> Annotated[List[Dict[str, Any]], "Results of the calls, in order"]:
+    """Run several read-only tool calls concurrently.
+    
+    Args:
+        calls (List[Dict[str, Any]]): Calls to run, each with a "name" from READ_ONLY_TOOLS and optional "args"
+        
+    Returns:
+        List[Dict[str, Any]]: One result dictionary per call, in the order given
+    """
+    coros = [_start_call(call) for call in calls]
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    logger.debug("Batch read of %d calls completed", len(calls))
+    return [
+        {"status": "error", "message": str(result)} if isinstance(result, BaseException) else result
+        for result in results
+    ]
+
+def _start_call(call: Any) -> Awaitable[Dict[str, Any]]:
+    """Create the coroutine for one batch_read entry, or an error result if the entry is invalid."""
+    if not isinstance(call, dict):
+        return _error_result(f"Invalid call {call!r}: expected {{\"name\": ..., \"args\": {{...}}}}")
+    name = call.get("name")
+    tool = READ_ONLY_TOOLS.get(name)
+    if tool is None:
+        return _error_result(f"{name} is not a read-only tool and cannot be batched")
+    args = call.get("args") or {}
+    if not isinstance(args, dict):
+        return _error_result(f"Invalid args for {name}: expected an object")
+    try:
+        return tool(**args)
+    except TypeError as e:
+        return _error_result(f"Invalid args for {name}: {str(e)}")
+
+async def _error_result(message: str) -> Dict[str, str]:
+    return {"status": "error", "message": message}
+
+async def extract_pages(
+    urls: Annotated[List[str], "URLs to read, each loaded in its own background tab"],
+    timeout: Annotated[int, "Navigation timeout in milliseconds"] = 5000
+) -> Annotated[List[Dict[str, Any]], "Page DOM of each URL, in order"]:
+    """Load several URLs in background tabs concurrently and return their page DOMs.
+    
+    The current page is left as it is. The mmids in the returned DOMs belong to the
+    background tabs and cannot be interacted with.
+    
+    Args:
+        urls (List[str]): The URLs to read
+        timeout (int): Navigation timeout in milliseconds
+        
+    Returns:
+        List[Dict[str, Any]]: One dictionary with status and DOM data per URL, in order
+    """
+    try:
+        results = await get_manager().parallel_extract(urls, timeout)
+        logger.debug("Extracted %d pages in parallel", len(urls))
+        return [result.to_dict() for result in results]
+    except Exception as e:
+        logger.error(f"Failed to extract pages: {str(e)}")
+        return [{"status": "error", "message": str(e)}]
+
 async def click_element(
     mmid: Annotated[str, "The mmid attribute of element to click"],
-    wait_before_execution: Annotated[int, "Milliseconds to wait before clicking"] = 0
+    wait_before_execution: Annotated[int, "Milliseconds to wait before clicking"] = 0,
+    wait_networkidle: Annotated[bool, "Whether to wait for the network to settle after the action"] = True
 ) -> Annotated[Dict[str, str], "Click action status"]:
     """Click an element identified by its mmid attribute.
     
     Args:
         mmid (str): The mmid attribute of the element to click
         wait_before_execution (int): Milliseconds to wait before clicking
+        wait_networkidle (bool): Whether to wait for the network to settle after the action
         
     Returns:
         Dict[str, str]: Dictionary containing status and message
     """
     try:
-        result = await playwright_manager.click(mmid, wait_before_execution)
-        logger.info(f"Click action completed for mmid {mmid}")
-        return result
+        result = await get_manager().click(mmid, wait_before_execution, wait_networkidle)
+        logger.debug("Click action completed for mmid %s", mmid)
+        return result.to_dict()
     except Exception as e:
         logger.error(f"Failed to click element with mmid {mmid}: {str(e)}")
         return {"status": "error", "message": str(e)}
 
 async def type_text(
     mmid: Annotated[str, "The mmid attribute of input element"],
-    content: Annotated[str, "Text content to type"]
+    content: Annotated[str, "Text content to type"],
+    wait_networkidle: Annotated[bool, "Whether to wait for the network to settle after the action"] = True
 ) -> Annotated[Dict[str, str], "Type action status"]:
     """Type text into an input field identified by mmid.
     
     Args:
         mmid (str): The mmid attribute of the input element
         content (str): Text content to type
+        wait_networkidle (bool): Whether to wait for the network to settle after the action
         
     Returns:
         Dict[str, str]: Dictionary containing status and message
     """
     try:
-        result = await playwright_manager.type(mmid, content)
-        logger.info(f"Text typing completed for mmid {mmid}")
-        return result
+        result = await get_manager().type(mmid, content, wait_networkidle)
+        logger.debug("Text typing completed for mmid %s", mmid)
+        return result.to_dict()
     except Exception as e:
         logger.error(f"Failed to type text for mmid {mmid}: {str(e)}")
         return {"status": "error", "message": str(e)}
@@ -124,7 +239,8 @@ async def text_and_click(
     text_element_mmid: Annotated[str, "mmid of text input element"],
     text_to_enter: Annotated[str, "Text to enter"],
     click_element_mmid: Annotated[str, "mmid of element to click after typing"],
-    wait_before_click: Annotated[int, "Milliseconds to wait before clicking"] = 0
+    wait_before_click: Annotated[int, "Milliseconds to wait before clicking"] = 0,
+    wait_networkidle: Annotated[bool, "Whether to wait for the network to settle after the action"] = True
 ) -> Annotated[Dict[str, str], "Action status"]:
     """Combined action: enter text and click another element.
     
@@ -133,16 +249,17 @@ async def text_and_click(
         text_to_enter (str): Text to enter
         click_element_mmid (str): mmid of the element to click
         wait_before_click (int): Milliseconds to wait before clicking
+        wait_networkidle (bool): Whether to wait for the network to settle after the action
         
     Returns:
         Dict[str, str]: Dictionary containing status and message
     """
     try:
-        result = await playwright_manager.enter_text_and_click(
-            text_element_mmid, text_to_enter, click_element_mmid, wait_before_click
+        result = await get_manager().enter_text_and_click(
+            text_element_mmid, text_to_enter, click_element_mmid, wait_before_click, wait_networkidle
         )
-        logger.info("Text and click action completed successfully")
-        return result
+        logger.debug("Text and click action completed successfully")
+        return result.to_dict()
     except Exception as e:
         logger.error(f"Failed to perform text and click action: {str(e)}")
         return {"status": "error", "message": str(e)}
@@ -154,23 +271,28 @@ async def close_browser() -> Annotated[Dict[str, str], "Shutdown status"]:
         Dict[str, str]: Dictionary containing status and message
     """
     try:
-        await playwright_manager.close()
-        logger.info("Browser closed successfully")
+        await get_manager().close()
+        logger.debug("Browser closed successfully")
         return {"status": "success", "message": "Browser closed"}
     except Exception as e:
         logger.error(f"Failed to close browser: {str(e)}")
         return {"status": "error", "message": str(e)}
 
-async def press_enter() -> Annotated[Dict[str, str], "Enter key press status"]:
+async def press_enter(
+    wait_networkidle: Annotated[bool, "Whether to wait for the network to settle after the action"] = True
+) -> Annotated[Dict[str, str], "Enter key press status"]:
     """Press the Enter key on the keyboard.
     
+    Args:
+        wait_networkidle (bool): Whether to wait for the network to settle after the action
+        
     Returns:
         Dict[str, str]: Dictionary containing status and message
     """
     try:
-        result = await playwright_manager.enter()
-        logger.info("Enter key pressed successfully")
-        return result
+        result = await get_manager().enter(wait_networkidle)
+        logger.debug("Enter key pressed successfully")
+        return result.to_dict()
     except Exception as e:
         logger.error(f"Failed to press Enter key: {str(e)}")
         return {"status": "error", "message": str(e)}
\ No newline at end of file
@@ -0,0 +1,58 @@
+from typing import List, Optional
+from playwright_helper.playwright_manager import PlaywrightManager
+import streamlit as st
+import asyncio
+import atexit
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a browser to close on exit
+CLOSE_TIMEOUT = 10
+
+# Managers handed out by get_manager, closed on interpreter exit
+_managers: List[PlaywrightManager] = []
+
+@st.cache_resource
+def get_manager(headless: bool = False, user_data_dir: Optional[str] = None) -> PlaywrightManager:
+    """Get the shared PlaywrightManager for the given configuration.
+    
+    The instance is cached across Streamlit reruns, so every caller with the same
+    (headless, user_data_dir) pair reuses the same browser instead of cold-starting one.
+    Set the CDP_URL env var to attach to a running Chrome instead of launching one.
+    
+    Args:
+        headless (bool): Whether to run the browser in headless mode
+        user_data_dir (Optional[str]): Profile directory, defaults to the USER_DATA_DIR env var
+        
+    Returns:
+        PlaywrightManager: The shared manager instance
+    """
+    manager = PlaywrightManager(
+        headless=headless,
+        user_data_dir=user_data_dir or os.environ.get("USER_DATA_DIR"),
+        # Attaching to a running Chrome copies its logins, so it only happens when asked for
+        cdp_url=os.environ.get("CDP_URL") or None
+    )
+    _managers.append(manager)
+    return manager
+
+def _close_managers() -> None:
+    """Close any browser still open when the interpreter exits.
+    
+    Each close runs on the event loop the manager was started on, which owns its
+    Playwright connection.
+    """
+    for manager in _managers:
+        if manager.context is None:
+            continue
+        if manager.loop is None or manager.loop.is_closed() or not manager.loop.is_running():
+            logger.error("Cannot close browser on exit: its event loop is no longer running")
+            continue
+        try:
+            asyncio.run_coroutine_threadsafe(manager.close(), manager.loop).result(CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Failed to close browser on exit: {str(e)}")
+
+atexit.register(_close_managers)
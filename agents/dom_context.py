@@ -0,0 +1,84 @@
+from typing import Any, Dict, List, Union
+from autogen_core.model_context import UnboundedChatCompletionContext
+from autogen_core.models import FunctionExecutionResultMessage, LLMMessage
+from playwright_helper.playwright_manager import json_loads
+import ast
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Marker of a tool result that carries a full page DOM
+DOM_MARKER = "'current_page_dom'"
+
+def parse_dom_payload(content: str) -> Any:
+    """Parse a tool result carrying a DOM, which is usually a Python dict repr.
+    
+    Args:
+        content (str): The tool result string
+        
+    Returns:
+        Any: The parsed payload
+        
+    Raises:
+        ValueError, SyntaxError: If the content is neither JSON nor a Python literal
+    """
+    if content.startswith('{"'):
+        return json_loads(content)
+    return ast.literal_eval(content)
+
+def summarize_dom(result: Union[Dict[str, Any], List[Any]], max_interactive: int = 50) -> Union[Dict[str, Any], List[Any]]:
+    """Compress a DOM tool result into its element count and interactive elements.
+    
+    A list, as returned by batch_read, has each of its DOM results compressed and its
+    other entries kept as they are.
+    
+    Args:
+        result (Union[Dict[str, Any], List[Any]]): A tool result containing current_page_dom, or a list of results
+        max_interactive (int): Maximum number of interactive elements to list
+        
+    Returns:
+        Union[Dict[str, Any], List[Any]]: Status, element count and the names of interactive elements
+    """
+    if isinstance(result, list):
+        return [
+            summarize_dom(item, max_interactive) if isinstance(item, dict) and "current_page_dom" in item else item
+            for item in result
+        ]
+    children = (result.get("current_page_dom") or {}).get("children", [])
+    interactive = [
+        f"{child['tag']}: {child['name']}" if child.get("name") else child["tag"]
+        for child in children if child.get("interactive")
+    ]
+    return {
+        "status": result.get("status", ""),
+        "message": "Page content retrieved",
+        "element_count": len(children),
+        "interactive": interactive[:max_interactive]
+    }
+
+class DomSummarizingChatCompletionContext(UnboundedChatCompletionContext):
+    """Model context that keeps only the most recent page DOM at full fidelity.
+    
+    Every older DOM tool result is replaced in place by its summarize_dom summary,
+    so earlier snapshots stop being re-sent to the model on every call.
+    """
+
+    async def get_messages(self) -> List[LLMMessage]:
+        dom_positions = [
+            (i, j)
+            for i, message in enumerate(self._messages) if isinstance(message, FunctionExecutionResultMessage)
+            for j, result in enumerate(message.content) if DOM_MARKER in result.content
+        ]
+        for i, j in dom_positions[:-1]:
+            message = self._messages[i]
+            result = message.content[j]
+            try:
+                summary = str(summarize_dom(parse_dom_payload(result.content)))
+            except Exception as e:
+                # Drop the superseded snapshot anyway, so it is not retried on every call
+                logger.error(f"Failed to summarize DOM result: {str(e)}")
+                summary = str({"message": "Superseded page content omitted"})
+            results = list(message.content)
+            results[j] = result.model_copy(update={"content": summary})
+            self._messages[i] = message.model_copy(update={"content": results})
+        return await super().get_messages()
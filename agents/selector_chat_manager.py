@@ -1,34 +1,35 @@
-from typing import List, Sequence, Dict, Any
+from typing import AsyncGenerator, List, Mapping, Sequence, Dict, Any, Optional, Union
+from collections import OrderedDict
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
 from autogen_agentchat.conditions import MaxMessageTermination, TextMentionTermination
 from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
 from autogen_agentchat.teams import SelectorGroupChat
 from autogen_agentchat.ui import Console
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelInfo, RequestUsage
+from autogen_core.tools import Tool, ToolSchema
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from .autogen_tools import *
+from .dom_context import DomSummarizingChatCompletionContext
 from dotenv import load_dotenv
+import asyncio
+import atexit
+import hashlib
+import httpx
+import json
 import os
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-model_client = OpenAIChatCompletionClient(
-    model="o3-mini",
-    api_key=os.environ.get("OPENAI_API_KEY")
-)
-
-# Initialize planner agent
-planner_agent = AssistantAgent(
-    name="planner_agent",
-    description="An agent that plans the tasks",
-    model_client=model_client,
-    system_message=""""You are a web automation task planner.
+# Seconds to wait for the pooled HTTP client to close on exit
+HTTP_CLOSE_TIMEOUT = 5
+
+# Configure agent system messages
+PLANNER_SYSTEM_MESSAGE = """"You are a web automation task planner.
     You will receive tasks from the user and will work with a browser_agent to accomplish it. You will think step by step and break down the tasks into sequence of simple subtasks. Subtasks will be delegated to the browser_agent to execute.
     
     Return Format:
@@ -38,13 +39,7 @@ planner_agent = AssistantAgent(
     "terminate": yes/no. Return yes when the exact task is complete without any compromises or you are absolutely convinced that the task cannot be completed, no otherwise. This is mandatory for every response.
     "final_response": This is the final answer string that will be returned to the user. In search tasks, unless explicitly stated, you will provide the single best suited result in the response instead of listing multiple options. This attribute only needs to be present when terminate is true.
 
-      **CREDENTIALS HANDLING**:
-    1. NEVER ask the user for login credentials or sensitive information
-    2. When login is required for a task:
-       - Instruct the browser_agent to use `!USERNAME!` for username fields
-       - Instruct the browser_agent to use `!PASSWORD!` for password fields
-    3. These placeholders will be automatically replaced with environment variables
-    4. Do not attempt to access or reference actual credentials in your plan
+    Credentials: never ask for them; when login is required, instruct the browser_agent to type `!USERNAME!` and `!PASSWORD!`, which are replaced automatically.
 
     Capabilities and limitation of the browser_agent:
     1. browser_agent can navigate to urls, perform simple interactions on a page (like type or click on an element) or answer any question you may have about the current page.
@@ -55,7 +50,7 @@ planner_agent = AssistantAgent(
     2. Do not combine multiple steps into one. A step should be strictly as simple as interacting with a single element or navigating to a page. If you need to interact with multiple elements or perform multiple actions, you will break it down into multiple steps.
     3. Very Important: Add verification as part of the plan, after each step and specifically before terminating to ensure that the task is completed successfully. Ask simple questions to verify the step completion (e.g. Can you confirm that White Nothing Phone 2 with 16GB RAM is present in the cart?). Do not assume the browser_agent has performed the task correctly.
     4. If one plan fails, you MUST revise the plan and try a different approach. For example, if clicking an element is giving a timeout error, try asking the browser agent for the current page dom again. You will NOT terminate a task untill you are absolutely convinced that the task is impossible to accomplish.
-    5. The first step should always be to initialise the browser
+    5. The first step should always be to initialise the browser. This is instant if the browser is already open, so never skip it.
     6. If there is captcha verification step involved, wait for user to solve and reply back.
     7. VERY IMPORTANT: After every interaction with any element of the webpage, be it clicking on something, pressing enter or loading a new page, the web page content might change. So, you need to instruct the browser agent to get the new dom whenever the page state changes.
     
@@ -81,47 +76,24 @@ planner_agent = AssistantAgent(
     Notice above how there is confirmation after each step and how interaction (e.g. setting source and destination) with each element is a seperate step. Follow same pattern.
     Remember: you are a very very persistent planner who will try every possible strategy to accomplish the task perfectly.
     Verify the results before terminating the task."""
-)
-
-# Initialize browser agent
-browser_agent = AssistantAgent(
-    name="browser_agent",
-    model_client=model_client,
-    tools=[initialize_browser, navigate_to_url, get_current_url, get_page_dom, click_element, type_text, text_and_click, press_enter, close_browser],
-    system_message="""You will perform web navigation tasks, which may include logging into websites and interacting with any web content using the functions made available to you.
-
-    **CREDENTIALS HANDLING**:
-    1. When encountering login fields:
-       - For username fields: Use `!USERNAME!` as placeholder
-       - For password fields: Use `!PASSWORD!` as placeholder
-    2. These will be automatically replaced with environment variables
-    3. Never type "os.getenv()" literally
-    4. Never hardcode or request credentials in plain text
+
+BROWSER_SYSTEM_MESSAGE = """You will perform web navigation tasks, which may include logging into websites and interacting with any web content using the functions made available to you.
+
+    Credentials: type `!USERNAME!` into username fields and `!PASSWORD!` into password fields; they are replaced automatically.
     
     Guidelines:
     1. Use the provided DOM representation for element location or text summarization. If anything changes or you are stuck with some error, the best solution is to get the current page dom AGAIN.
     2. Interact with pages using only the "mmid" attribute in DOM elements.
     3. You must extract mmid value from the fetched DOM, do not conjure it up. mmid should strictly be a numeric string.
-    4. The state of the change will change after every possible interaction with any element, be it clicking on something or pressing enter or loading a new page, make sure to always retrieve the current page dom whenever the state of the page changes.
-    5. Execute function sequentially to avoid navigation timing issues. The given actions are NOT parallelizable. They are intended for sequential execution.
-    6. If you need to call multiple functions in a task step, call one function at a time. Wait for the function's response before invoking the next function. This is important to avoid collision.
+    4. The state of the change will change after every possible interaction with any element, be it clicking on something or pressing enter or loading a new page, make sure to always retrieve the current page dom whenever the state of the page changes. When loading a new page, prefer navigate_and_snapshot, which navigates and returns the new page dom in a single call. Fall back to navigate_to_url followed by get_page_dom only if it fails. If a page comes back nearly empty because it renders with JavaScript, navigate again with wait_until="networkidle".
+    5. Execute function sequentially to avoid navigation timing issues. The given actions are NOT parallelizable. They are intended for sequential execution. The only exception is read-only lookups (get_current_url, get_page_dom), which can be run together in one batch_read call. To read several pages you do not need to interact with (e.g. comparing search results), pass their URLs to extract_pages, which loads them in background tabs at once; mmids from those DOMs cannot be clicked or typed into.
+    6. If you need to call multiple functions in a task step, call one function at a time (a batch_read call counts as one). Wait for the function's response before invoking the next function. This is important to avoid collision.
     7. Strictly for search fields, submit the field by pressing Enter key. For other forms, click on the submit button.
     8. Once the task is completed, return a short summary of the actions you performed to accomplish the task, and what worked.
     9. Additionally, If task requires an answer, you will also provide a short and precise answer followed by ##TERMINATE TASK##.
     10.Ensure that user questions are answered from the DOM and not from memory or assumptions.
     11. Do not provide any mmid values in your response.
-    12. Do not repeat the same action multiple times if it fails. Instead, if something did not work after a few attempts, retrieve and analyse the page dom again.""")
-
-# Initialize user proxy agent
-user_proxy_agent = UserProxyAgent(
-    "UserProxyAgent",
-    description="A user to solve for captcha or do the verification whenever planner or browser agent are stuck.",
-)
-
-# Configure termination conditions
-text_mention_termination = TextMentionTermination("TERMINATE")
-# max_messages_termination = MaxMessageTermination(max_messages=100)
-termination = text_mention_termination
+    12. Do not repeat the same action multiple times if it fails. Instead, if something did not work after a few attempts, retrieve and analyse the page dom again."""
 
 # Configure selector prompt
 selector_prompt = """Select the most appropriate agent to continue this task. Follow these rules strictly:
@@ -155,11 +127,270 @@ Available agents: {participants}
 Your response must ONLY contain the name of ONE agent from {participants}, with no additional text or explanation.
 """
 
-# Initialize team with all agents
-team = SelectorGroupChat(
-    [planner_agent, browser_agent, user_proxy_agent],
-    model_client=model_client,
-    termination_condition=termination,
-    selector_prompt=selector_prompt,
-    allow_repeated_speaker=True
-)
\ No newline at end of file
+def select_speaker_by_rules(messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> Optional[str]:
+    """Apply the deterministic hand-off rules of the selector prompt without calling the model.
+    
+    Args:
+        messages (Sequence[BaseAgentEvent | BaseChatMessage]): The conversation so far
+        
+    Returns:
+        Optional[str]: The next speaker, or None when the model has to decide
+    """
+    if not messages:
+        return "planner_agent"
+    last = messages[-1]
+    content = getattr(last, "content", "")
+    if not isinstance(content, str):
+        content = str(content)
+
+    if last.source == "user" or "##TERMINATE TASK##" in content:
+        return "planner_agent"
+    if last.source == "planner_agent":
+        try:
+            reply = json.loads(content, strict=False)
+        except json.JSONDecodeError:
+            reply = None
+        if isinstance(reply, dict) and reply.get("next_step") and str(reply.get("terminate", "")).lower() != "yes":
+            return "browser_agent"
+    if last.source == "browser_agent":
+        return "planner_agent"
+    if "captcha" in content.lower():
+        return "UserProxyAgent"
+    return None
+
+class CachedSpeakerSelector:
+    """Selector function that reuses the speaker the model picked for an identical hand-off.
+    
+    After the model selects a speaker, the pick is remembered under a signature of the
+    message it was made for (its source, a hash of its first 512 characters and the
+    participants). When the same signature comes up again the remembered speaker is
+    returned and the selector model call is skipped. The deterministic rules in
+    select_speaker_by_rules are checked first. Returning None defers to the model.
+    """
+    
+    def __init__(self, participants: Sequence[str], maxsize: int = 512):
+        self.participants = tuple(participants)
+        self.maxsize = maxsize
+        self._cache: OrderedDict[tuple, str] = OrderedDict()
+        self._pending: Optional[tuple] = None
+        self._seen = 0
+
+    def _signature(self, message: BaseAgentEvent | BaseChatMessage) -> tuple:
+        content = getattr(message, "content", "")
+        if not isinstance(content, str):
+            content = str(content)
+        digest = hashlib.blake2b(content[:512].encode(), digest_size=16).digest()
+        return (message.source, digest, self.participants)
+
+    def _remember(self, signature: tuple, speaker: str) -> None:
+        self._cache[signature] = speaker
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def __call__(self, messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> Optional[str]:
+        # The first message after a model selection comes from the speaker it picked
+        if self._pending is not None and len(messages) > self._seen:
+            speaker = messages[self._seen].source
+            if speaker in self.participants:
+                self._remember(self._pending, speaker)
+        self._pending = None
+        self._seen = len(messages)
+
+        speaker = select_speaker_by_rules(messages)
+        if speaker is not None:
+            logger.debug("Selected %s by rule", speaker)
+            return speaker
+
+        signature = self._signature(messages[-1])
+        speaker = self._cache.get(signature)
+        if speaker is not None:
+            self._cache.move_to_end(signature)
+            logger.debug("Selected %s from the selector cache", speaker)
+            return speaker
+        self._pending = signature
+        return None
+
+# Bounds on the {history} sent to the selector model
+SELECTOR_HISTORY_MESSAGES = 6
+SELECTOR_HISTORY_LINE_CHARS = 500
+
+def trim_selector_history(prompt: str, speakers: Sequence[str],
+                          max_messages: int = SELECTOR_HISTORY_MESSAGES,
+                          max_line_chars: int = SELECTOR_HISTORY_LINE_CHARS) -> str:
+    """Keep only the last max_messages messages of the history section of a selector prompt.
+    
+    Overlong lines, typically DOM payloads, are cut to max_line_chars.
+    
+    Args:
+        prompt (str): The formatted selector prompt
+        speakers (Sequence[str]): Names that start a message in the history
+        max_messages (int): Number of most recent messages to keep
+        max_line_chars (int): Maximum length of a single history line
+        
+    Returns:
+        str: The prompt with a shortened history section
+    """
+    start_marker = "Current conversation context:\n"
+    start = prompt.find(start_marker)
+    end = prompt.find("\n\nAvailable agents:", start)
+    if start < 0 or end < 0:
+        return prompt
+    start += len(start_marker)
+
+    prefixes = tuple(f"{speaker}:" for speaker in speakers)
+    kept = []
+    message_count = 0
+    for line in reversed(prompt[start:end].split("\n")):
+        if len(line) > max_line_chars:
+            line = line[:max_line_chars] + " ..."
+        kept.append(line)
+        if line.startswith(prefixes):
+            message_count += 1
+            if message_count >= max_messages:
+                break
+    return prompt[:start] + "\n".join(reversed(kept)) + prompt[end:]
+
+class SelectorModelClient(ChatCompletionClient):
+    """Model client for the speaker selector that trims the history before each call.
+    
+    SelectorGroupChat embeds the whole conversation in {history}; this wrapper cuts it
+    down with trim_selector_history and delegates everything else to the wrapped client.
+    """
+    
+    def __init__(self, client: ChatCompletionClient, speakers: Sequence[str]):
+        self._client = client
+        self._speakers = tuple(speakers)
+
+    def _trim(self, messages: Sequence[LLMMessage]) -> List[LLMMessage]:
+        trimmed = []
+        for message in messages:
+            if isinstance(message.content, str):
+                message = message.model_copy(update={"content": trim_selector_history(message.content, self._speakers)})
+            trimmed.append(message)
+        return trimmed
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        return await self._client.create(
+            self._trim(messages), tools=tools, json_output=json_output,
+            extra_create_args=extra_create_args, cancellation_token=cancellation_token
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return self._client.create_stream(
+            self._trim(messages), tools=tools, json_output=json_output,
+            extra_create_args=extra_create_args, cancellation_token=cancellation_token
+        )
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self):
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+def build_team(loop: Optional[asyncio.AbstractEventLoop] = None) -> SelectorGroupChat:
+    """Build the planner, browser and user proxy agents and the team that coordinates them.
+    
+    Args:
+        loop (Optional[asyncio.AbstractEventLoop]): Event loop the team will run on; its pooled
+            HTTP client is closed on that loop at exit
+    
+    Returns:
+        SelectorGroupChat: The configured team
+    """
+    # Pooled HTTP client shared by every agent and the selector
+    http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=60.0,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+    )
+
+    def _close_http_client() -> None:
+        # Pooled connections belong to the loop the team ran on
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(http_client.aclose(), loop).result(HTTP_CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Failed to close HTTP client on exit: {str(e)}")
+
+    atexit.register(_close_http_client)
+
+    # Initialize OpenAI client
+    model_client = OpenAIChatCompletionClient(
+        model="o3-mini",
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_client=http_client
+    )
+
+    # Initialize planner agent
+    planner_agent = AssistantAgent(
+        name="planner_agent",
+        description="An agent that plans the tasks",
+        model_client=model_client,
+        system_message=PLANNER_SYSTEM_MESSAGE
+    )
+
+    # Initialize browser agent
+    browser_agent = AssistantAgent(
+        name="browser_agent",
+        model_client=model_client,
+        model_context=DomSummarizingChatCompletionContext(),
+        tools=[initialize_browser, navigate_to_url, navigate_and_snapshot, get_current_url, get_page_dom, batch_read, extract_pages, click_element, type_text, text_and_click, press_enter, close_browser],
+        system_message=BROWSER_SYSTEM_MESSAGE
+    )
+
+    # Initialize user proxy agent
+    user_proxy_agent = UserProxyAgent(
+        "UserProxyAgent",
+        description="A user to solve for captcha or do the verification whenever planner or browser agent are stuck.",
+    )
+
+    # Configure termination conditions
+    text_mention_termination = TextMentionTermination("TERMINATE")
+    # max_messages_termination = MaxMessageTermination(max_messages=100)
+    termination = text_mention_termination
+
+    participants = [planner_agent, browser_agent, user_proxy_agent]
+
+    # Initialize team with all agents
+    return SelectorGroupChat(
+        participants,
+        model_client=SelectorModelClient(model_client, ["user"] + [agent.name for agent in participants]),
+        termination_condition=termination,
+        selector_prompt=selector_prompt,
+        allow_repeated_speaker=True,
+        selector_func=CachedSpeakerSelector([agent.name for agent in participants])
+    )
@@ -1,14 +1,47 @@
 import streamlit as st
 import asyncio
+import atexit
 import json
-from playwright_helper.playwright_manager import PlaywrightManager
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from autogen_agentchat.messages import ToolCallExecutionEvent
 from autogen_agentchat.base import TaskResult
-from agents import team
+from agents.browser_pool import get_manager
+from agents.dom_context import DOM_MARKER, json_loads, parse_dom_payload, summarize_dom
 from autogen_core.models import FunctionExecutionResult
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
 
-# Initialize PlaywrightManager
-playwright_manager = PlaywrightManager()
+def _configure_logging() -> None:
+    """Send log records through a queue so handler output happens on a background thread."""
+    root = logging.getLogger()
+    # Streamlit re-executes this script on every rerun; install the handler only once
+    if any(isinstance(handler, QueueHandler) for handler in root.handlers):
+        return
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = QueueListener(log_queue, stream_handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    listener.start()
+    atexit.register(listener.stop)
+
+_configure_logging()
+
+# Seconds between checks for Streamlit stop and rerun requests while a task runs
+TASK_POLL_SECONDS = 0.5
+
+@st.cache_resource
+def get_team():
+    """Build the agent team once and reuse it across reruns."""
+    from agents import build_team
+    return build_team(loop=_bg_loop())
+
+# Warm up the shared PlaywrightManager so tool calls reuse it across reruns
+get_manager()
 
 # Set up Streamlit page
 st.set_page_config(
@@ -42,12 +75,33 @@ with st.sidebar:
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        if isinstance(message["content"], dict):
-            st.json(message["content"])
-        else:
-            st.markdown(message["content"])
+def _json_body(message):
+    """Serialize a dict message for st.json once and keep it on the message for later reruns."""
+    body = message.get("json_body")
+    if body is None:
+        body = json.dumps(message["content"], default=repr)
+        message["json_body"] = body
+    return body
+
+def render_messages(messages):
+    for message in messages:
+        with st.chat_message(message["role"]):
+            if isinstance(message["content"], dict):
+                st.json(_json_body(message))
+            else:
+                st.markdown(message["content"])
+
+with st.container():
+    render_messages(st.session_state.messages)
+
+def _extract_content(message):
+    """Return the payload to format: the DOM result of a tool call event, or the message content."""
+    if isinstance(message, ToolCallExecutionEvent) and isinstance(message.content, list):
+        for item in message.content:
+            if isinstance(item, FunctionExecutionResult) and isinstance(item.content, str) and DOM_MARKER in item.content:
+                return item.content
+        return None
+    return getattr(message, 'content', None)
 
 # Function to format agent messages
 def format_message(message):
@@ -55,39 +109,27 @@ def format_message(message):
         if isinstance(message, TaskResult):
             return f"**Final Response: {message.messages[-1].content}**"
 
-        elif isinstance(message, ToolCallExecutionEvent) and isinstance(message.content, list):
-            for item in message.content:
-                if isinstance(item, FunctionExecutionResult) and isinstance(item.content, str) and "'current_page_dom'" in item.content:
-                    try:
-                        content_data = json.loads(item.content.replace("'", "\""))
-                        return content_data
-                    except json.JSONDecodeError:
-                        return "Dom content"
-                            
-        elif hasattr(message, 'content'):
-            content = message.content
-   
-            if isinstance(content, str) and "'current_page_dom'" in content:
-                try:
-                    content_json = json.loads(content.replace("'", "\""))
-                    return {
-                        "status": content_json.get("status", ""),
-                        "message": "Page content retrieved",
-                        "element_count": len(content_json["current_page_dom"].get("children", []))
-                    }
-                except:
-                    return "Dom content"
+        is_tool_event = isinstance(message, ToolCallExecutionEvent) and isinstance(message.content, list)
+        content = _extract_content(message)
+
+        if isinstance(content, str) and DOM_MARKER in content:
+            try:
+                content_data = parse_dom_payload(content)
+                if is_tool_event:
+                    return content_data
+                return summarize_dom(content_data)
+            except Exception:
+                return "Dom content"
+
+        if is_tool_event or not hasattr(message, 'content'):
+            return str(message)
 
+        if isinstance(content, str):
             try:
-                if isinstance(content, str):
-                    try:
-                        return json.loads(content)
-                    except json.JSONDecodeError:
-                        return content
+                return json_loads(content)
+            except json.JSONDecodeError:
                 return content
-            except Exception as e:
-                return str(content)
-        return str(message)
+        return content
     except Exception as e:
         return f"Message processing error: {str(e)}"
 
@@ -100,6 +142,9 @@ async def process_task(task):
     status_container = st.empty()
     status_container.info("Agents are processing your task...")
     
+    # The manager is shared across reruns, so hand it this session's current credentials
+    get_manager().set_credentials(st.session_state.credentials)
+    team = get_team()
     stream = team.run_stream(task=task)
     
     try:
@@ -113,27 +158,74 @@ async def process_task(task):
                 else:
                     role = message.source
             
-            # Add to message history
-            st.session_state.messages.append({
+            entry = {
                 "role": role,
                 "content": formatted_content,
                 "source": getattr(message, 'source', None)
-            })
+            }
+            # Add to message history already formatted, so reruns never re-parse it
+            st.session_state.messages.append(entry)
             
-            # Display the message
-            with st.chat_message(role):
-                if isinstance(formatted_content, dict):
-                    st.json(formatted_content)
-                else:
-                    st.markdown(formatted_content)
+            # Display the message. Each st.* element is one delta whether or not messages are
+            # batched, so rendering as they arrive costs the same and never delays a message
+            render_messages([entry])
     
     except Exception as e:
         st.error(f"Error processing task: {str(e)}")
     finally:
         status_container.empty()
 
+@st.cache_resource
+def _bg_loop():
+    """Event loop kept alive across tasks so client connections and the browser stay warm."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+@st.cache_resource
+def _task_lock():
+    """Tasks share the loop thread and the browser, so sessions submit them one at a time."""
+    return threading.Lock()
+
+async def _run_with_script_ctx(coro, ctx):
+    # Streamlit calls made from the loop thread need the submitting script's context
+    thread = threading.current_thread()
+    previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    add_script_run_ctx(thread, ctx)
+    try:
+        return await coro
+    finally:
+        setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+def _run_task(task):
+    """Run a task on the background loop while keeping the script thread interruptible.
+    
+    Streamlit only raises its stop and rerun exceptions on the script thread, from inside
+    st.* calls, so the wait is split into short polls with a cheap st.* call in between.
+    """
+    heartbeat = st.empty()
+    lock = _task_lock()
+    while not lock.acquire(timeout=TASK_POLL_SECONDS):
+        heartbeat.empty()
+    try:
+        fut = asyncio.run_coroutine_threadsafe(
+            _run_with_script_ctx(process_task(task), get_script_run_ctx()), _bg_loop()
+        )
+        try:
+            while True:
+                try:
+                    return fut.result(timeout=TASK_POLL_SECONDS)
+                except TimeoutError:
+                    heartbeat.empty()
+        except BaseException:
+            # Stop button, rerun or error: do not leave the task running unattended
+            fut.cancel()
+            raise
+    finally:
+        lock.release()
+
 # Main chat interface
 if prompt := st.chat_input("Enter your task here (e.g. 'search for Yashika Malhotra on LinkedIn')"):
     # Process the task
     with st.spinner("Coordinating agent team..."):
-        asyncio.run(process_task(prompt))
\ No newline at end of file
+        _run_task(prompt)
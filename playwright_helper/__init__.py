@@ -1,3 +1,3 @@
-from .playwright_manager import PlaywrightManager
+from .playwright_manager import ActionResult, PlaywrightManager
 
-__all__ = ["PlaywrightManager"]
\ No newline at end of file
+__all__ = ["ActionResult", "PlaywrightManager"]
\ No newline at end of file
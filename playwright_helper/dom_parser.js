@@ -89,9 +89,10 @@ function extractDOM(mmidCounter) {
         
         const tag = element.tagName.toLowerCase();
         
-        // Assign mmid and set it as an attribute
+        // Assign mmid, set it as an attribute and index the element by it
         const mmid = String(counter.count++);
         element.setAttribute('mmid', mmid);
+        window.__mmidIndex.set(mmid, element);
 
         const info = { 
             mmid: mmid,
@@ -129,6 +130,8 @@ function extractDOM(mmidCounter) {
     function processElements() {
         const result = [];
         const counter = { count: mmidCounter || 1 };
+        // mmids are reassigned on every extraction, so start a fresh index
+        window.__mmidIndex = new Map();
         
         // Function to process an element and its children
         function processElement(element) {
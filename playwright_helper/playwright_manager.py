@@ -1,13 +1,151 @@
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+"""Playwright browser management for the agent tools.
+
+Almost all time here is spent waiting on CDP round trips to Chromium, not on Python.
+Speedups come from making fewer round trips (batching work into one evaluate call,
+caching DOM snapshots, reusing pages and connections); Python-side micro-optimizations
+barely register.
+
+Logging is configured by the application entry point, never on import.
+"""
+from playwright.async_api import async_playwright, Browser, BrowserContext, CDPSession, Frame, Locator, Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import asyncio
+import contextlib
 import json
-from typing import Dict, List, Any, Optional
-import streamlit as st
+from typing import Dict, List, Any, NamedTuple, Optional, Tuple
 import logging
+import os
+import pathlib
+import time
+
+# Shared JSON parser: orjson is a declared dependency, the stdlib fallback keeps partial installs working
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_USER_DATA_DIR = "./.pw_profile"
+
+# Credential placeholders; text containing them is masked in log output
+SECRET_TOKENS = frozenset({"!USERNAME!", "!PASSWORD!"})
+
+CDP_CONNECT_TIMEOUT = 2000
+
+# DOM extraction function, read once; the mmid counter is passed as its argument
+_DOM_SCRIPT = f"({pathlib.Path(__file__).with_name('dom_parser.js').read_text()})"
+
+# Installed into every document so each extraction only ships a one-line call. The DOM
+# comes back as a single JSON string, which Playwright transfers far more compactly than
+# its per-value serialization of a nested object.
+# It also counts DOM mutations and user input in window.__domVersion, so a cached DOM can
+# be checked against the live page; the mmid attributes set by extraction are not counted.
+_DOM_VERSION_SCRIPT = """
+window.__domVersion = 0;
+new MutationObserver((records) => {
+    if (records.some(r => r.type !== 'attributes' || r.attributeName !== 'mmid')) window.__domVersion++;
+}).observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+document.addEventListener('input', () => { window.__domVersion++; }, true);
+"""
+_DOM_INIT_SCRIPT = f"window.__extractDom = {_DOM_SCRIPT};{_DOM_VERSION_SCRIPT}"
+_DOM_VERSION_CALL = "() => typeof window.__domVersion === 'number' ? window.__domVersion : null"
+# Checks the DOM version and extracts in the same round trip: when the page is still at
+# the version the caller has cached, the extraction is skipped and dom comes back null.
+_DOM_CALL = """([counter, known]) => {
+    if (!window.__extractDom) return null;
+    const version = typeof window.__domVersion === 'number' ? window.__domVersion : null;
+    if (known !== null && version === known) return { version, dom: null };
+    return { version, dom: JSON.stringify(window.__extractDom(counter)) };
+}"""
+_DOM_FALLBACK_CALL = f"(counter) => JSON.stringify({_DOM_SCRIPT}(counter))"
+
+# Fills an input and clicks another element in one round trip. Elements are looked up
+# in the mmid index built by dom_parser.js, falling back to the attribute selector. The
+# native value setter is used so frameworks that track input values see the change.
+# Only enabled, visible text inputs and textareas take this path; for anything else a
+# reason is returned and the caller falls back to the locator fill and click, which
+# wait for actionability and raise when the element cannot be used.
+_FILL_AND_CLICK_SCRIPT = """([textMmid, text, clickMmid, waitMs]) => {
+    const find = (mmid) => (window.__mmidIndex && window.__mmidIndex.get(mmid))
+        || document.querySelector(`[mmid="${mmid}"]`);
+    const usable = (el) => el.isConnected && !el.matches(':disabled')
+        && el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    const textTypes = ['text', 'search', 'email', 'password', 'tel', 'url', 'number'];
+    const input = find(textMmid);
+    const target = find(clickMmid);
+    if (!input || !target) return 'element not found';
+    const fillable = input.tagName === 'TEXTAREA'
+        || (input.tagName === 'INPUT' && textTypes.includes(input.type));
+    if (!fillable || input.readOnly || !usable(input)) return 'input not fillable';
+    if (!usable(target)) return 'target not clickable';
+    input.focus();
+    const proto = (input.tagName === 'TEXTAREA' ? HTMLTextAreaElement : HTMLInputElement).prototype;
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(input, text);
+    input.dispatchEvent(new Event('input', { bubbles: true }));
+    input.dispatchEvent(new Event('change', { bubbles: true }));
+    return new Promise(resolve => setTimeout(() => {
+        if (!usable(target)) { resolve('target not clickable'); return; }
+        // Widgets often listen for the press rather than the click itself
+        for (const type of ['pointerdown', 'mousedown', 'pointerup', 'mouseup']) {
+            const Ctor = type.startsWith('pointer') ? PointerEvent : MouseEvent;
+            target.dispatchEvent(new Ctor(type, { bubbles: true, cancelable: true, composed: true, button: 0 }));
+        }
+        target.click();
+        resolve(null);
+    }, waitMs));
+}"""
+# Chromium flags that lower memory and CPU use
+LAUNCH_ARGS = ["--disable-dev-shm-usage", "--disable-gpu"]
+
+# Image, media and font files the DOM parser never reads, blocked when block_assets is enabled.
+# They are blocked by URL through CDP rather than with context.route, which would disable
+# the HTTP cache and add a Python round trip to every request.
+BLOCKED_EXTENSIONS = ("png", "jpg", "jpeg", "gif", "webp", "avif", "bmp", "ico",
+                      "woff", "woff2", "ttf", "otf", "eot",
+                      "mp4", "webm", "mp3", "ogg", "wav", "m4a", "mov")
+BLOCKED_URL_PATTERNS = [pattern for ext in BLOCKED_EXTENSIONS for pattern in (f"*.{ext}", f"*.{ext}?*")]
+
+# Seconds a cached page DOM stays valid while the page reports no changes
+DOM_CACHE_TTL = 60.0
+
+# Maximum number of extra pages used for parallel navigation and extraction
+PAGE_POOL_SIZE = 3
+
+# Number of page operations after which the browser context is recreated
+RECYCLE_EVERY = 50
+
+# Upper bound on how long an interaction waits for the page's network to settle
+NETWORK_IDLE_TIMEOUT = 1500
+
+class ActionResult(NamedTuple):
+    """Immutable result of a browser action.
+    
+    Fields can also be read by key, e.g. result["status"], like the dicts returned before.
+    This gives the manager API a fixed result shape; it is not an allocation saving, since
+    the agent tools convert every result to a dict with to_dict() for the model.
+    
+    Attributes:
+        status (str): "success" or "error"
+        message (str): Description of the outcome
+        url (Optional[str]): URL navigated to, for navigations
+        current_page_dom (Optional[Dict[str, Any]]): Page DOM, for DOM reads and navigations that reused a cached one
+    """
+    status: str
+    message: str
+    url: Optional[str] = None
+    current_page_dom: Optional[Dict[str, Any]] = None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the result as a dictionary, omitting unset fields."""
+        return {key: value for key, value in zip(self._fields, self) if value is not None}
+
 class PlaywrightManager:
     """A manager class for handling Playwright browser automation.
     
@@ -16,59 +154,304 @@ class PlaywrightManager:
     
     Attributes:
         headless (bool): Whether to run the browser in headless mode
+        user_data_dir (str): Profile directory used for persistent browser contexts
+        block_assets (bool): Whether images, media and fonts are blocked
+        cdp_url (Optional[str]): CDP endpoint of a running Chrome tried before launching a new browser
         playwright: Playwright instance
         browser: Browser instance
         context: Browser context
         page: Page instance
         mmid_counter (int): Counter for generating unique mmid attributes
+        use_persistent (bool): Whether the context is launched on the persistent profile
+        loop (Optional[asyncio.AbstractEventLoop]): Event loop the browser was started on
     """
     
-    def __init__(self, headless: bool = False):
+    def __init__(self, headless: bool = False, user_data_dir: Optional[str] = None, block_assets: bool = True,
+                 cdp_url: Optional[str] = None, credentials: Optional[Dict[str, str]] = None):
         """Initialize the PlaywrightManager.
         
         Args:
             headless (bool): Whether to run the browser in headless mode
+            user_data_dir (Optional[str]): Profile directory used for persistent browser contexts
+            block_assets (bool): Whether to block images, media and fonts to cut page-load bytes
+            cdp_url (Optional[str]): CDP endpoint of a running Chrome to attach to, or None to always launch
+            credentials (Optional[Dict[str, str]]): "username" and "password" substituted for the placeholders
         """
         self.headless = headless
+        self.user_data_dir = user_data_dir or DEFAULT_USER_DATA_DIR
+        self.block_assets = block_assets
+        self.cdp_url = cdp_url
+        self._creds: Dict[str, str] = dict(credentials or {})
+        self._cdp: Optional[CDPSession] = None
+        self._connected_over_cdp = False
         self.playwright: Optional[async_playwright] = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
         self.mmid_counter = 1
+        self.use_persistent = True
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._initialized = False
+        self._loc_cache: Dict[str, Locator] = {}
+        # Last main page DOM keyed by (url, DOM version), cleared by actions and main frame navigations
+        self._dom_cache: Dict[Tuple[str, int], Tuple[float, Dict[str, Any]]] = {}
+        self._dom_ttl = DOM_CACHE_TTL
+        self._ops_since_recycle = 0
+        self._recycle_every = RECYCLE_EVERY
+        self._pool: asyncio.Queue[Page] = asyncio.Queue()
+        self._pool_slots = asyncio.Semaphore(PAGE_POOL_SIZE)
 
-    async def initialize(self) -> None:
+    async def initialize(self, user_data_dir: Optional[str] = None, use_persistent: bool = True) -> None:
         """Initialize the Playwright browser instance.
         
+        When cdp_url is set, the Chrome listening there is attached to first, which skips
+        the launch; work happens in a new context seeded with that browser's logins, leaving
+        its own tabs untouched. Otherwise, with use_persistent enabled,
+        the context is launched on top of a user data directory so cookies, cache and
+        logins survive between sessions.
+        
+        Args:
+            user_data_dir (Optional[str]): Profile directory, defaults to the one given at construction
+            use_persistent (bool): Whether to launch a persistent context instead of a fresh one
+            
         Raises:
             Exception: If browser initialization fails
         """
+        if self.playwright is not None:
+            # Release what is left of a browser that crashed or was closed by the user
+            with contextlib.suppress(Exception):
+                await self.close()
         try:
             self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(headless=self.headless)
-            self.context = await self.browser.new_context()
-            self.page = await self.context.new_page()
+            # The Playwright connection only works on this loop
+            self.loop = asyncio.get_running_loop()
+            self.use_persistent = use_persistent
+            self.user_data_dir = user_data_dir or self.user_data_dir
+            self._connected_over_cdp = await self._connect_over_cdp()
+            await self._open_context()
+            self._initialized = True
             logger.info("Browser initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize browser: {str(e)}")
+            logger.error("Failed to initialize browser: %s", e)
+            # Do not leave a half-started browser process behind
+            with contextlib.suppress(Exception):
+                await self.close()
             raise
 
-    async def goto_url(self, url: str, timeout: int = 30000) -> Dict[str, Any]:
+    @property
+    def is_initialized(self) -> bool:
+        """Whether the browser is up and its main page is still open.
+        
+        Turns False when the page is closed, e.g. by the user closing the window, or
+        when the browser crashes or disconnects, so the browser can be initialized again.
+        """
+        if not self._initialized or self.page is None or self.page.is_closed():
+            return False
+        return self.browser is None or self.browser.is_connected()
+
+    async def __aenter__(self) -> "PlaywrightManager":
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def _connect_over_cdp(self) -> bool:
+        """Attach to a running Chrome on cdp_url.
+        
+        Returns:
+            bool: Whether a browser answered on the endpoint
+        """
+        if not self.cdp_url:
+            return False
+        try:
+            self.browser = await self.playwright.chromium.connect_over_cdp(self.cdp_url, timeout=CDP_CONNECT_TIMEOUT)
+            logger.info("Connected to running browser at %s", self.cdp_url)
+            return True
+        except Exception as e:
+            logger.info("No browser at %s, launching a new one: %s", self.cdp_url, e)
+            return False
+
+    async def _open_context(self, storage_state: Optional[Dict[str, Any]] = None) -> None:
+        """Open a browser context and page, installing the DOM helper and navigation listener.
+        
+        Args:
+            storage_state (Optional[Dict[str, Any]]): Cookies and local storage to seed a non-persistent context with
+        """
+        if self._connected_over_cdp:
+            # Work in a context of our own, seeded with the running browser's logins, so the
+            # user's tabs are never navigated away and asset blocking never reaches them
+            if storage_state is None and self.browser.contexts:
+                storage_state = await self.browser.contexts[0].storage_state()
+            self.context = await self.browser.new_context(storage_state=storage_state)
+            self.page = await self.context.new_page()
+        elif self.use_persistent:
+            self.context = await self.playwright.chromium.launch_persistent_context(
+                self.user_data_dir, headless=self.headless, args=LAUNCH_ARGS
+            )
+            self.browser = self.context.browser
+            # A persistent context opens with a blank page already
+            self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+        else:
+            if self.browser is None:
+                self.browser = await self.playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+            self.context = await self.browser.new_context(storage_state=storage_state)
+            self.page = await self.context.new_page()
+        # Raw input events for the main page go through one long-lived session
+        self._cdp = await self.context.new_cdp_session(self.page)
+        self._loc_cache.clear()
+        self._dom_cache.clear()
+        # Pooled pages belonged to the previous context
+        self._pool = asyncio.Queue()
+        await self.context.add_init_script(_DOM_INIT_SCRIPT)
+        if self.block_assets:
+            await self._block_assets(self._cdp)
+        self.page.on("framenavigated", self._on_frame_navigated)
+
+    async def _block_assets(self, session: CDPSession) -> None:
+        """Block requests for files the DOM parser does not need on the session's page.
+        
+        Args:
+            session (CDPSession): CDP session attached to the page
+        """
+        await session.send("Network.enable")
+        await session.send("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+    async def _recycle_context(self) -> None:
+        """Recreate the browser context to release resources Playwright accumulates over time.
+        
+        The session carries over: a persistent profile is reopened from disk, otherwise
+        the cookies and local storage are transferred through storage_state.
+        """
+        storage_state = None
+        if self._connected_over_cdp or not self.use_persistent:
+            storage_state = await self.context.storage_state()
+        await self.context.close()
+        await self._open_context(storage_state)
+        self._ops_since_recycle = 0
+        logger.info("Browser context recycled")
+
+    def _on_frame_navigated(self, frame: Frame) -> None:
+        """Drop the cached DOM when the main page loads a new document, including reloads started by the page."""
+        if frame.parent_frame is None:
+            self._dom_cache.clear()
+
+    async def _dom_version(self) -> Optional[int]:
+        """Get the main page's DOM mutation counter, or None when the page does not report one."""
+        try:
+            return await self.page.evaluate(_DOM_VERSION_CALL)
+        except Exception:
+            # The page may be between documents
+            return None
+
+    def _cached_dom(self, url: str, version: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Get the cached DOM of the main page if it is still current.
+        
+        Args:
+            url (str): The main page URL
+            version (Optional[int]): The main page's current DOM version
+            
+        Returns:
+            Optional[Dict[str, Any]]: The cached DOM, or None on a miss
+        """
+        cached = self._dom_cache.get((url, version))
+        if version is None or cached is None or time.monotonic() - cached[0] >= self._dom_ttl:
+            return None
+        return cached[1]
+
+    def _cached_version(self, url: str) -> Optional[int]:
+        """Get the DOM version of the cached DOM for url, or None if there is no current one."""
+        for (cached_url, version), (cached_at, _) in self._dom_cache.items():
+            if cached_url == url and time.monotonic() - cached_at < self._dom_ttl:
+                return version
+        return None
+
+    async def acquire(self) -> Page:
+        """Take a page from the pool, opening one if fewer than PAGE_POOL_SIZE exist.
+        
+        Returns:
+            Page: A page to use for a background navigation or extraction
+        """
+        await self._pool_slots.acquire()
+        try:
+            return self._pool.get_nowait()
+        except asyncio.QueueEmpty:
+            try:
+                page = await self.context.new_page()
+                if self.block_assets:
+                    await self._block_assets(await self.context.new_cdp_session(page))
+                return page
+            except Exception:
+                self._pool_slots.release()
+                raise
+
+    def release(self, page: Page) -> None:
+        """Return a page taken with acquire to the pool.
+        
+        Args:
+            page (Page): The page to return
+        """
+        if not page.is_closed() and page.context is self.context:
+            self._pool.put_nowait(page)
+        self._pool_slots.release()
+
+    async def parallel_extract(self, urls: List[str], timeout: int = 30000) -> List[ActionResult]:
+        """Navigate to several URLs on pooled pages concurrently and extract their DOMs.
+        
+        Args:
+            urls (List[str]): The URLs to visit
+            timeout (int): Navigation timeout in milliseconds
+            
+        Returns:
+            List[ActionResult]: One DOM representation per URL, in order
+        """
+        async def extract(url: str) -> ActionResult:
+            page = await self.acquire()
+            try:
+                result = await self.goto_url(url, timeout, page=page)
+                if result["status"] != "success":
+                    return result
+                return await self.get_clean_dom_representation(page=page)
+            finally:
+                self.release(page)
+
+        return await asyncio.gather(*(extract(url) for url in urls))
+
+    async def goto_url(self, url: str, timeout: int = 30000, page: Optional[Page] = None,
+                       wait_until: str = "domcontentloaded") -> ActionResult:
         """Navigate to a specified URL.
         
         Args:
             url (str): The URL to navigate to
             timeout (int): Navigation timeout in milliseconds
+            page (Optional[Page]): Page to navigate, defaults to the main page
+            wait_until (str): Load state to wait for, e.g. "load" or "networkidle" for pages that need it
             
         Returns:
-            Dict[str, Any]: Status and message of the navigation attempt
+            ActionResult: Status and message of the navigation attempt
         """
         try:
-            await self.page.goto(url, timeout=timeout)
-            logger.info(f"Successfully navigated to {url}")
-            return {"status": "success", "message": f"Successfully navigated to {url}", "url": url}
+            if page is None:
+                # Navigating again to the page we are on, with nothing changed since, reuses its DOM,
+                # unless the caller asked for a later load state than the default
+                if self.page.url == url and wait_until == "domcontentloaded":
+                    cached = self._cached_dom(url, await self._dom_version())
+                    if cached is not None:
+                        logger.info("Reused cached page for %s", url)
+                        return ActionResult("success", f"Already on {url}", url, cached)
+                self._dom_cache.clear()
+                # Recycle only before navigating, when the current DOM is discarded anyway
+                if self._ops_since_recycle >= self._recycle_every:
+                    await self._recycle_context()
+                self._ops_since_recycle += 1
+                self._loc_cache.clear()
+                page = self.page
+            await page.goto(url, timeout=timeout, wait_until=wait_until)
+            logger.info("Successfully navigated to %s", url)
+            return ActionResult("success", f"Successfully navigated to {url}", url)
         except Exception as e:
-            logger.error(f"Failed to navigate to {url}: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            logger.error("Failed to navigate to %s: %s", url, e)
+            return ActionResult("error", str(e))
 
     async def get_current_url(self) -> str:
         """Get the current page URL.
@@ -78,80 +461,169 @@ class PlaywrightManager:
         """
         return self.page.url
 
-    async def get_clean_dom_representation(self) -> Dict[str, Any]:
+    async def get_clean_dom_representation(self, page: Optional[Page] = None) -> ActionResult:
         """Get a clean DOM representation of the current page.
         
+        The main page's DOM is served from cache while the page has neither navigated,
+        changed nor been interacted with since it was last extracted.
+        
+        Args:
+            page (Optional[Page]): Page to extract, defaults to the main page
+            
         Returns:
-            Dict[str, Any]: DOM representation with status and message
+            ActionResult: DOM representation with status and message
         """
         try:
-            url = self.page.url
-            await self.page.wait_for_url(url=url)
-            with open("playwright_helper/dom_parser.js", "r") as f:
-                dom_script = f.read()
-            dom = await self.page.evaluate(f"({dom_script})({self.mmid_counter})")
+            is_main_page = page is None or page is self.page
+            page = page or self.page
+            url = page.url
+            known = self._cached_version(url) if is_main_page else None
+            result = await page.evaluate(_DOM_CALL, [self.mmid_counter, known])
+            if result is not None and result["dom"] is None:
+                cached = self._dom_cache.get((url, known))
+                if cached is not None:
+                    logger.info("Reused cached DOM for %s", url)
+                    return ActionResult("success", "Current page dom retrieved successfully", current_page_dom=cached[1])
+                # The cache was dropped by a navigation while the call was in flight
+                result = await page.evaluate(_DOM_CALL, [self.mmid_counter, None])
+            if result is None:
+                # Documents loaded before the init script was registered lack the helper
+                version = None
+                raw_dom = await page.evaluate(_DOM_FALLBACK_CALL, self.mmid_counter)
+            else:
+                version = result["version"]
+                raw_dom = result["dom"]
+            if is_main_page:
+                # mmids are reassigned on every extraction
+                self._loc_cache.clear()
+            dom = json_loads(raw_dom)
             
-            self.mmid_counter = dom.get('mmid_counter', self.mmid_counter + 1000)
+            if is_main_page:
+                self.mmid_counter = dom.get('mmid_counter', self.mmid_counter + 1000)
+                self._dom_cache.clear()
+                if version is not None:
+                    self._dom_cache[(url, version)] = (time.monotonic(), dom)
             
-            return {
-                "current_page_dom": dom,
-                "status": "success",
-                "message": "Current page dom retrieved successfully"
-            }
+            return ActionResult("success", "Current page dom retrieved successfully", current_page_dom=dom)
              
         except Exception as e:
-            logger.error(f"Failed to get DOM representation: {str(e)}")
-            return {
-                "current_page_dom": None,
-                "status": "error",
-                "message": str(e)
-            }
-
-    async def click(self, mmid: str, wait_before_execution: int = 0) -> Dict[str, Any]:
+            logger.error("Failed to get DOM representation: %s", e)
+            return ActionResult("error", str(e))
+
+    def _locator(self, mmid: str) -> Locator:
+        """Get the locator for an mmid, reusing it until the page DOM is extracted again.
+        
+        Args:
+            mmid (str): The mmid attribute of the element
+            
+        Returns:
+            Locator: Locator matching the element
+        """
+        locator = self._loc_cache.get(mmid)
+        if locator is None:
+            locator = self._loc_cache[mmid] = self.page.locator(f'[mmid="{mmid}"]')
+        return locator
+
+    def set_credentials(self, credentials: Dict[str, str]) -> None:
+        """Replace the credentials substituted for the !USERNAME! and !PASSWORD! placeholders.
+        
+        Args:
+            credentials (Dict[str, str]): Mapping with "username" and "password"
+        """
+        self._creds = dict(credentials)
+
+    @staticmethod
+    def _redact(text: str) -> str:
+        """Mask text that stands for a credential before it is logged."""
+        return "***" if any(token in text for token in SECRET_TOKENS) else text
+
+    def _substitute_credentials(self, text: str) -> str:
+        """Replace the !USERNAME! and !PASSWORD! placeholders with the configured credentials.
+        
+        Credentials given to the manager take precedence over the AGENT_USERNAME and
+        AGENT_PASSWORD environment variables.
+        
+        Args:
+            text (str): Text that may contain credential placeholders
+            
+        Returns:
+            str: The text with placeholders replaced
+            
+        Raises:
+            ValueError: If a placeholder is used but no matching credential is configured
+        """
+        if "!USERNAME!" not in text and "!PASSWORD!" not in text:
+            return text
+        username = self._creds.get("username") or os.environ.get("AGENT_USERNAME", "")
+        password = self._creds.get("password") or os.environ.get("AGENT_PASSWORD", "")
+        if "!USERNAME!" in text and not username:
+            raise ValueError("No username configured; enter it in the sidebar or set AGENT_USERNAME")
+        if "!PASSWORD!" in text and not password:
+            raise ValueError("No password configured; enter it in the sidebar or set AGENT_PASSWORD")
+        return text.replace("!USERNAME!", username).replace("!PASSWORD!", password)
+
+    async def _wait_for_network_idle(self, timeout: int = NETWORK_IDLE_TIMEOUT) -> None:
+        """Wait briefly for the network to go idle so the next DOM read sees the updated page.
+        
+        Args:
+            timeout (int): Maximum milliseconds to wait; hitting it is not an error
+        """
+        with contextlib.suppress(PlaywrightTimeoutError):
+            await self.page.wait_for_load_state("networkidle", timeout=timeout)
+
+    async def click(self, mmid: str, wait_before_execution: int = 0, wait_networkidle: bool = True) -> ActionResult:
         """Click an element identified by its mmid attribute.
         
         Args:
             mmid (str): The mmid attribute of the element to click
             wait_before_execution (int): Milliseconds to wait before clicking
+            wait_networkidle (bool): Whether to wait for the network to settle afterwards
             
         Returns:
-            Dict[str, Any]: Status and message of the click action
+            ActionResult: Status and message of the click action
         """
         try:
+            self._ops_since_recycle += 1
+            self._dom_cache.clear()
             if wait_before_execution:
                 await self.page.wait_for_timeout(wait_before_execution)
-            await self.page.click(f'[mmid="{mmid}"]')
-            logger.info(f"Successfully clicked element with mmid: {mmid}")
-            return {"status": "success", "message": f"Successfully clicked element with mmid: {mmid}"}
+            await self._locator(mmid).click()
+            if wait_networkidle:
+                await self._wait_for_network_idle()
+            logger.info("Successfully clicked element with mmid: %s", mmid)
+            return ActionResult("success", f"Successfully clicked element with mmid: {mmid}")
         except Exception as e:
-            logger.error(f"Failed to click element with mmid {mmid}: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            logger.error("Failed to click element with mmid %s: %s", mmid, e)
+            return ActionResult("error", str(e))
 
-    async def type(self, mmid: str, content: str) -> Dict[str, Any]:
+    async def type(self, mmid: str, content: str, wait_networkidle: bool = True) -> ActionResult:
         """Type content into an input field identified by mmid.
         
         Args:
             mmid (str): The mmid attribute of the input element
             content (str): The content to type
+            wait_networkidle (bool): Whether to wait for the network to settle afterwards
             
         Returns:
-            Dict[str, Any]: Status and message of the type action
+            ActionResult: Status and message of the type action
         """
         try:
+            self._ops_since_recycle += 1
+            self._dom_cache.clear()
             original_content = content
-            if content == "!USERNAME!":
-                content = st.session_state.credentials.get("username", "")
-            elif content == "!PASSWORD!":
-                content = st.session_state.credentials.get("password", "")
-            await self.page.fill(f'[mmid="{mmid}"]', content)
-            logger.info(f"Successfully typed {original_content} into element with mmid: {mmid}")
-            return {"status": "success", "message": f"Successfully typed {original_content} into element with mmid: {mmid}"}
+            content = self._substitute_credentials(content)
+            await self._locator(mmid).fill(content)
+            if wait_networkidle:
+                await self._wait_for_network_idle()
+            logger.info("Successfully typed %s into element with mmid: %s", self._redact(original_content), mmid)
+            return ActionResult("success", f"Successfully typed {original_content} into element with mmid: {mmid}")
         except Exception as e:
-            logger.error(f"Failed to type into element with mmid {mmid}: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            logger.error("Failed to type into element with mmid %s: %s", mmid, e)
+            return ActionResult("error", str(e))
 
     async def enter_text_and_click(self, text_element_mmid: str, text_to_enter: str, 
-                           click_element_mmid: str, wait_before_click_execution: int = 0) -> Dict[str, Any]:
+                           click_element_mmid: str, wait_before_click_execution: int = 0,
+                           wait_networkidle: bool = True) -> ActionResult:
         """Enter text and click another element in sequence.
         
         Args:
@@ -159,42 +631,95 @@ class PlaywrightManager:
             text_to_enter (str): Text to enter
             click_element_mmid (str): mmid of the element to click
             wait_before_click_execution (int): Milliseconds to wait before clicking
+            wait_networkidle (bool): Whether to wait for the network to settle afterwards
             
         Returns:
-            Dict[str, Any]: Status and message of the combined action
+            ActionResult: Status and message of the combined action
         """
         try:
-            await self.page.fill(f'[mmid="{text_element_mmid}"]', text_to_enter)
-            if wait_before_click_execution:
-                await self.page.wait_for_timeout(wait_before_click_execution)
-            await self.page.click(f'[mmid="{click_element_mmid}"]')
-            logger.info(f"Successfully entered text and clicked elements")
-            return {"status": "success", "message": f"Successfully entered {text_to_enter} to mmid {text_element_mmid} and clicked element with mmid: {click_element_mmid}"}
+            self._ops_since_recycle += 1
+            self._dom_cache.clear()
+            text = self._substitute_credentials(text_to_enter)
+            try:
+                error = await self.page.evaluate(_FILL_AND_CLICK_SCRIPT, [
+                    str(text_element_mmid), text, str(click_element_mmid), wait_before_click_execution
+                ])
+            except Exception as e:
+                # A click that submits a form can navigate away before the call returns
+                if "Execution context was destroyed" not in str(e):
+                    raise
+                error = None
+            if error is not None:
+                # Elements missing or not usable from script: fall back to the auto-waiting locator actions
+                logger.debug("Falling back to locator fill and click: %s", error)
+                await self._locator(text_element_mmid).fill(text)
+                if wait_before_click_execution:
+                    await self.page.wait_for_timeout(wait_before_click_execution)
+                await self._locator(click_element_mmid).click()
+            if wait_networkidle:
+                await self._wait_for_network_idle()
+            logger.info("Successfully entered %s to mmid %s and clicked mmid %s",
+                        self._redact(text_to_enter), text_element_mmid, click_element_mmid)
+            return ActionResult("success", f"Successfully entered {text_to_enter} to mmid {text_element_mmid} and clicked element with mmid: {click_element_mmid}")
         except Exception as e:
-            logger.error(f"Failed to enter text and click: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            logger.error("Failed to enter text and click: %s", e)
+            return ActionResult("error", str(e))
         
-    async def enter(self) -> Dict[str, Any]:
+    async def enter(self, wait_networkidle: bool = True) -> ActionResult:
         """Press the Enter key.
         
+        Args:
+            wait_networkidle (bool): Whether to wait for the network to settle afterwards
+            
         Returns:
-            Dict[str, Any]: Status and message of the Enter key press
+            ActionResult: Status and message of the Enter key press
         """
         try:
-            await self.page.keyboard.press("Enter")
+            self._dom_cache.clear()
+            if self._cdp is not None:
+                await self._cdp.send("Input.dispatchKeyEvent", {
+                    "type": "keyDown", "key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13, "text": "\r"
+                })
+                await self._cdp.send("Input.dispatchKeyEvent", {
+                    "type": "keyUp", "key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13
+                })
+            else:
+                await self.page.keyboard.press("Enter")
+            if wait_networkidle:
+                await self._wait_for_network_idle()
             logger.info("Enter key pressed successfully")
-            return {"status": "success", "message": "Enter key pressed"}
+            return ActionResult("success", "Enter key pressed")
         except Exception as e:
-            logger.error(f"Failed to press Enter key: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            logger.error("Failed to press Enter key: %s", e)
+            return ActionResult("error", str(e))
 
     async def close(self) -> None:
-        """Close the browser and cleanup resources."""
+        """Close the browser and cleanup resources.
+        
+        Safe to call more than once and after a partial initialization.
+        """
+        self._initialized = False
         try:
-            await self.context.close()
-            await self.browser.close()
-            await self.playwright.stop()
+            if self._connected_over_cdp:
+                # Disconnects and drops our contexts, leaving the attached Chrome running
+                if self.browser is not None:
+                    await self.browser.close()
+            else:
+                # Closing the context flushes the profile to disk without deleting it
+                if self.context is not None:
+                    await self.context.close()
+                if self.browser is not None and self.browser.is_connected():
+                    await self.browser.close()
+            if self.playwright is not None:
+                await self.playwright.stop()
             logger.info("Browser closed successfully")
         except Exception as e:
-            logger.error(f"Error while closing browser: {str(e)}")
+            logger.error("Error while closing browser: %s", e)
             raise
+        finally:
+            self.playwright = None
+            self.browser = None
+            self.context = None
+            self.page = None
+            self._cdp = None
+            self._connected_over_cdp = False